@@ -6,7 +6,9 @@ Main functionality:
   return answer and optional source excerpts.
 """
 
-from fastapi import APIRouter
+from functools import lru_cache
+
+from fastapi import APIRouter, Depends
 
 from app.config import get_settings
 from app.models.schemas import ChatRequest, ChatResponse
@@ -16,8 +18,12 @@ from app.services.chat_service import ChatService
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
+@lru_cache(maxsize=1)
 def get_chat_service() -> ChatService:
-    """Build ChatService with shared EmbeddingsService and configured LLM settings."""
+    """
+    Build ChatService once with shared EmbeddingsService and configured LLM settings.
+    Cached so the lazily loaded HF pipeline stays warm across requests.
+    """
     settings = get_settings()
     return ChatService(
         embeddings_service=get_embeddings_service(),
@@ -25,15 +31,23 @@ def get_chat_service() -> ChatService:
         openai_api_key=settings.openai_api_key,
         openai_model=settings.openai_model,
         fallback_model=settings.fallback_model,
+        local_llm=settings.local_llm,
+        context_max_chars=settings.context_max_chars,
+        confident_distance=settings.confident_distance,
+        answer_cache_size=settings.answer_cache_size,
+        answer_cache_ttl=settings.answer_cache_ttl,
+        fallback_onnx=settings.fallback_onnx,
+        fallback_onnx_path=settings.fallback_onnx_path,
+        hf_batch_size=settings.hf_batch_size,
+        hf_batch_wait_ms=settings.hf_batch_wait_ms,
     )
 
 
 @router.post("/ask", response_model=ChatResponse)
-async def ask(request: ChatRequest):
+async def ask(request: ChatRequest, chat: ChatService = Depends(get_chat_service)):
     """
     Send a question to the chatbot. The answer is generated using
     the indexed document content (RAG) and NLP/AI models.
     """
-    chat = get_chat_service()
-    answer, sources = chat.answer(request.question)
+    answer, sources = await chat.answer(request.question)
     return ChatResponse(answer=answer, sources=sources if sources else None)
@@ -2,25 +2,34 @@
 Document upload API: accept PDF files and index them for the chatbot.
 
 Main functionality:
-- POST /upload: validate PDF, save file, extract text, chunk, embed, store in ChromaDB.
+- POST /upload: validate PDF, stream file to disk, extract text, chunk, embed, store in ChromaDB.
 - GET /status: return number of chunks in the index (for UI/debugging).
 - POST /clear: delete the vector collection so user can re-upload fresh.
 """
 
+import re
+import tempfile
+from functools import lru_cache
 from pathlib import Path
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 from app.config import get_settings
 from app.models.schemas import DocumentUploadResponse
 from app.services.pdf_service import PDFService
-from app.services.embeddings_service import get_embeddings_service
+from app.services.embeddings_service import EmbeddingsService, get_embeddings_service
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
+UPLOAD_READ_CHUNK_SIZE = 64 * 1024
+# Characters not allowed in stored upload filenames (Unicode letters/digits are kept)
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w. -]")
 
+
+@lru_cache(maxsize=1)
 def get_pdf_service() -> PDFService:
-    """Build PDFService with configured chunk size and overlap."""
+    """Build PDFService once with configured chunk size and overlap."""
     settings = get_settings()
     return PDFService(
         chunk_size=settings.chunk_size,
@@ -29,7 +38,11 @@ def get_pdf_service() -> PDFService:
 
 
 @router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    pdf_service: PDFService = Depends(get_pdf_service),
+    embeddings_service: EmbeddingsService = Depends(get_embeddings_service),
+):
     """
     Upload a PDF: validate type/size, save to disk, extract text via PDFService,
     chunk text, embed via EmbeddingsService, add to ChromaDB. Returns page count and chunks indexed.
@@ -45,26 +58,39 @@ async def upload_document(file: UploadFile = File(...)):
             detail="Only PDF files are allowed.",
         )
     max_bytes = settings.max_upload_size_mb * 1024 * 1024
-    contents = await file.read()
-    if not contents:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
-    if len(contents) > max_bytes:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size exceeds {settings.max_upload_size_mb} MB limit.",
-        )
 
     settings.uploads_dir.mkdir(parents=True, exist_ok=True)
-    safe_name = "".join(c for c in file.filename or "document.pdf" if c.isalnum() or c in "._- ") or "document"
+    # No leading dots (hidden files, "..") and never an empty stem ("document.pdf" instead)
+    safe_name = _UNSAFE_FILENAME_CHARS.sub("", file.filename or "")
     if not safe_name.lower().endswith(".pdf"):
         safe_name += ".pdf"
+    stem = safe_name[: -len(".pdf")].lstrip(". ")
+    safe_name = f"{stem}{safe_name[-len('.pdf'):]}" if stem.strip(" .") else "document.pdf"
     file_path = settings.uploads_dir / safe_name
-    file_path.write_bytes(contents)
+    # Stream to a temp file in fixed-size reads so memory stays constant and oversize
+    # uploads are rejected as soon as they cross the limit; rename once complete.
+    # Disk writes, PDF parsing and embedding are blocking: run them off the event loop.
+    tmp = tempfile.NamedTemporaryFile(dir=settings.uploads_dir, suffix=".part", delete=False)
+    tmp_path = Path(tmp.name)
+    try:
+        total = 0
+        with tmp:
+            while chunk := await file.read(UPLOAD_READ_CHUNK_SIZE):
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File size exceeds {settings.max_upload_size_mb} MB limit.",
+                    )
+                await run_in_threadpool(tmp.write, chunk)
+        if total == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        await run_in_threadpool(tmp_path.replace, file_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
-    pdf_service = get_pdf_service()
-    embeddings_service = get_embeddings_service()
     try:
-        chunks, page_count = pdf_service.process_pdf(file_path)
+        chunks, page_count = await run_in_threadpool(pdf_service.process_pdf, file_path)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Failed to process PDF: {str(e)}")
 
@@ -74,7 +100,8 @@ async def upload_document(file: UploadFile = File(...)):
             detail="No text could be extracted from the PDF.",
         )
 
-    chunks_indexed = embeddings_service.add_chunks(
+    chunks_indexed = await run_in_threadpool(
+        embeddings_service.add_chunks,
         chunks,
         metadata={"filename": file.filename or "document.pdf"},
     )
@@ -87,18 +114,16 @@ async def upload_document(file: UploadFile = File(...)):
 
 
 @router.get("/status")
-async def index_status():
+async def index_status(embeddings: EmbeddingsService = Depends(get_embeddings_service)):
     """Return how many chunks are in the index (for debugging / UI)."""
-    embeddings = get_embeddings_service()
     return {"chunks_indexed": embeddings.count()}
 
 
 @router.post("/clear")
-async def clear_index():
+async def clear_index(embeddings_service: EmbeddingsService = Depends(get_embeddings_service)):
     """
     Clear the document index (vector store). Use this before re-uploading
     if you want to apply updated chunking or start fresh.
     """
-    embeddings_service = get_embeddings_service()
     embeddings_service.clear()
     return {"message": "Document index cleared. You can upload PDFs again."}
@@ -7,11 +7,13 @@ Main functionality:
 - BASE_DIR / UPLOADS_DIR / VECTOR_STORE_PATH used for file and ChromaDB storage.
 """
 
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings
 
+__all__ = ["BASE_DIR", "UPLOADS_DIR", "DATA_DIR", "VECTOR_STORE_PATH", "Settings", "get_settings"]
 
 # --- Base paths (project root, uploads folder, ChromaDB persistence)
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,19 +34,48 @@ class Settings(BaseSettings):
 
     # --- Document processing: max file size, allowed type, chunk size/overlap for RAG
     max_upload_size_mb: int = 20
-    allowed_content_types: tuple = ("application/pdf",)
+    allowed_content_types: frozenset[str] = frozenset({"application/pdf"})
     chunk_size: int = 500
     chunk_overlap: int = 50
 
     # --- Embeddings: local model name; OpenAI model when OPENAI_API_KEY is set
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
     openai_embedding_model: str = "text-embedding-3-small"
+    # Optional reduced vector size (text-embedding-3-* only), e.g. 512: smaller index, faster search
+    openai_embedding_dimensions: Optional[int] = None
     top_k_chunks: int = 8
+    # Vector store backend: "chroma" (default) or "faiss" (in-RAM HNSW, needs faiss-cpu)
+    vector_store: Literal["chroma", "faiss"] = "chroma"
+    # FAISS only: store vectors as fp16 (half the index memory); applies to newly built indexes
+    faiss_fp16: bool = True
+    # Persist chunk embeddings by (model, content hash) so re-uploads skip OpenAI; least
+    # recently used rows are evicted past the cap (~6 KB per 1536-dim row)
+    embedding_cache: bool = True
+    embedding_cache_max_rows: int = 50_000
+    # --- Retrieval: max distance of the best hit for a "confident" match, which skips the
+    # extra keyword-style searches. Distance is inner-product space (1 - cosine); 0.4 means
+    # cosine >= 0.6. text-embedding-3-small question-to-passage scores sit lower than
+    # older models (relevant passages mostly ~0.4-0.65), so only a strong match clears it.
+    # context_max_chars truncates the context for the local model only
+    context_max_chars: int = 2500
+    confident_distance: float = 0.4
 
-    # --- LLM: if OPENAI_API_KEY set, use OpenAI; else local HuggingFace FLAN-T5
+    # --- LLM: answers come from OpenAI, or from local HuggingFace FLAN-T5 when local_llm is set.
+    # OPENAI_API_KEY is always required (embeddings use OpenAI either way)
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-3.5-turbo"
     fallback_model: str = "google/flan-t5-small"
+    local_llm: bool = False
+    # Run the local model on ONNX Runtime (needs optimum[onnxruntime]); point the path at a
+    # pre-exported / INT8-quantized model dir, otherwise fallback_model is exported on load
+    fallback_onnx: bool = False
+    fallback_onnx_path: Optional[Path] = None
+    # Dynamic batching of concurrent local-model prompts (local_llm only): max batch and wait window
+    hf_batch_size: int = 8
+    hf_batch_wait_ms: float = 20
+    # --- Answer cache: repeated questions against an unchanged index skip RAG + LLM
+    answer_cache_size: int = 1024
+    answer_cache_ttl: int = 3600
 
     # --- Paths (override for Docker or custom deployment)
     uploads_dir: Path = UPLOADS_DIR
@@ -56,6 +87,7 @@ class Settings(BaseSettings):
         extra = "ignore"
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Return application settings (new instance per call; reads env each time)."""
+    """Return application settings (built once per process; .env is parsed on first call)."""
     return Settings()
@@ -1,6 +1,3 @@
-
-
-
 """
 PDF Chatbot - FastAPI application entry point.
 
@@ -25,6 +22,23 @@ from app.config import get_settings
 from app.models.schemas import HealthResponse
 from app.api import documents, chat
 
+__all__ = ["app", "create_app"]
+
+# Static responses, built once at import instead of on every hit (e.g. load balancer probes)
+_ROOT_RESPONSE = HTMLResponse(content="""
+        <!DOCTYPE html>
+        <html><head><meta charset="utf-8"><title>PDF Chatbot API</title></head>
+        <body style="font-family:system-ui;max-width:40rem;margin:2rem auto;padding:0 1rem;">
+        <h1>PDF Chatbot API</h1>
+        <p>Backend is running. Use the <strong>Streamlit UI</strong> to upload PDFs and chat:</p>
+        <pre style="background:#eee;padding:1rem;border-radius:6px;">streamlit run streamlit_app.py</pre>
+        <p>Or run both with: <code>python -m app.main</code></p>
+        <p>Then open <a href="http://localhost:8501">http://localhost:8501</a>.</p>
+        <p><a href="/docs">API docs (OpenAPI)</a> &middot; <a href="/health">Health</a></p>
+        </body></html>
+""")
+_HEALTH = HealthResponse()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -51,25 +65,14 @@ def create_app() -> FastAPI:
     app.include_router(chat.router)
 
     @app.get("/", include_in_schema=False, response_class=HTMLResponse)
-    def root():
+    async def root():
         """Serve a simple HTML page with instructions to run Streamlit UI."""
-        return """
-        <!DOCTYPE html>
-        <html><head><meta charset="utf-8"><title>PDF Chatbot API</title></head>
-        <body style="font-family:system-ui;max-width:40rem;margin:2rem auto;padding:0 1rem;">
-        <h1>PDF Chatbot API</h1>
-        <p>Backend is running. Use the <strong>Streamlit UI</strong> to upload PDFs and chat:</p>
-        <pre style="background:#eee;padding:1rem;border-radius:6px;">streamlit run streamlit_app.py</pre>
-        <p>Or run both with: <code>python -m app.main</code></p>
-        <p>Then open <a href="http://localhost:8501">http://localhost:8501</a>.</p>
-        <p><a href="/docs">API docs (OpenAPI)</a> &middot; <a href="/health">Health</a></p>
-        </body></html>
-        """
+        return _ROOT_RESPONSE
 
     @app.get("/health", response_model=HealthResponse)
-    def health():
+    async def health():
         """Health check endpoint for monitoring and load balancers."""
-        return HealthResponse()
+        return _HEALTH
 
     return app
 
@@ -79,6 +82,10 @@ app = create_app()
 # ----------------------------
 # Dev runner (replaces run.py)
 # ----------------------------
+# Delays (s) between backend readiness probes before the UI is started
+_READINESS_BACKOFF = (0.02, 0.05, 0.1, 0.2, 0.4, 0.8, 1.6)
+
+
 def _run_dev_launcher():
     """
     Starts:
@@ -94,6 +101,8 @@ def _run_dev_launcher():
     import time
     from pathlib import Path
 
+    import httpx
+
     ROOT = Path(__file__).resolve().parents[1]  # project root (contains streamlit_app.py)
     os.chdir(ROOT)
     if str(ROOT) not in sys.path:
@@ -135,9 +144,24 @@ def _run_dev_launcher():
     backend_thread = threading.Thread(target=run_backend, daemon=True)
     backend_thread.start()
 
-    time.sleep(1.5)
-    if not backend_thread.is_alive():
-        print(f"Backend failed to start (port {backend_port} may be in use).")
+    # Wait until /health answers instead of a fixed sleep (backoff, ~3 s in total)
+    # Wildcard binds are reachable on loopback; a specific interface must be probed directly
+    probe_host = {"0.0.0.0": "127.0.0.1", "": "127.0.0.1", "::": "::1"}.get(backend_host, backend_host)
+    if ":" in probe_host:
+        probe_host = f"[{probe_host}]"  # IPv6 literal in a URL
+    health_url = f"http://{probe_host}:{backend_port}/health"
+    for delay in _READINESS_BACKOFF:
+        time.sleep(delay)
+        if not backend_thread.is_alive():
+            print(f"Backend failed to start (port {backend_port} may be in use).")
+            raise SystemExit(1)
+        try:
+            httpx.get(health_url, timeout=0.2).raise_for_status()
+            break
+        except httpx.HTTPError:
+            continue
+    else:
+        print(f"Backend did not become ready on port {backend_port}.")
         raise SystemExit(1)
 
     streamlit_proc = subprocess.Popen(
@@ -0,0 +1,16 @@
+"""
+Worker-process entry point for parallel PDF text extraction.
+
+Kept outside app.services and importing only PyMuPDF, so spawned extraction workers
+start without loading the rest of the application (ChromaDB, OpenAI, FastAPI).
+"""
+
+from typing import List
+
+import fitz  # PyMuPDF
+
+
+def extract_range(file_path: str, lo: int, hi: int) -> List[str]:
+    """Extract text of pages [lo, hi) in a worker process (opens its own document)."""
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text() for i in range(lo, hi)]
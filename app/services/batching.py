@@ -0,0 +1,74 @@
+"""
+Dynamic (micro-)batching for model calls shared across concurrent requests.
+
+Main functionality:
+- MicroBatcher: callers submit single items from any thread; a background worker
+  groups up to max_batch_size items arriving within max_wait_ms, calls the batch
+  function once, and hands each caller its own result.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesce concurrent single-item calls into one batch_fn(items) -> results call."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[T]], List[R]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[tuple[T, Future]]" = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, item: T) -> R:
+        """Queue one item and block until its result (or exception) is ready."""
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        return fut.result()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
+
+    def _next_batch(self) -> List[tuple[T, Future]]:
+        """Block for the first item, then gather more until the batch is full or the window ends."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
@@ -3,14 +3,32 @@ Chat service: RAG (retrieve + generate) for answering questions from documents.
 
 Main functionality:
 - _get_context: embed question, search ChromaDB for top-k chunks; optional extra queries
-  from question words/phrases to improve retrieval for policy-style Q&A.
-- _answer_with_openai / _answer_with_hf: generate answer from context (OpenAI or FLAN-T5).
-- answer: orchestrate context retrieval, LLM call, return answer and source excerpts.
+  from question words/phrases to improve retrieval for policy-style Q&A. All queries are
+  embedded in one batched call; the extra searches are skipped when the best primary hit
+  is a confident match.
+- _answer_with_openai / _answer_with_hf: generate answer from context (OpenAI, or FLAN-T5
+  with local_llm; FLAN-T5 optionally on ONNX Runtime; concurrent FLAN-T5 prompts are
+  dynamically batched).
+- answer: orchestrate context retrieval, LLM call, return answer and source excerpts
+  (sources reuse the primary top-k chunks; no second search). Answers are cached per
+  (normalized question, index version) with LRU+TTL eviction.
 """
 
+import re
+import threading
+from pathlib import Path
 from typing import List, Optional
 
+from cachetools import TTLCache
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.batching import MicroBatcher
 from app.services.embeddings_service import EmbeddingsService
+from app.services.openai_client import get_async_openai_client
+
+# Question words used for the extra keyword-style queries (3+ letters/digits in any
+# script, punctuation and underscores dropped)
+_WORD_RE = re.compile(r"[^\W_]{3,}")
 
 
 class ChatService:
@@ -23,36 +41,76 @@ class ChatService:
         openai_api_key: Optional[str] = None,
         openai_model: str = "gpt-3.5-turbo",
         fallback_model: str = "google/flan-t5-base",
+        local_llm: bool = False,
+        context_max_chars: int = 2500,
+        confident_distance: float = 0.4,
+        answer_cache_size: int = 1024,
+        answer_cache_ttl: int = 3600,
+        fallback_onnx: bool = False,
+        fallback_onnx_path: Optional[Path] = None,
+        hf_batch_size: int = 8,
+        hf_batch_wait_ms: float = 20,
     ):
         self.embeddings = embeddings_service
         self.top_k = top_k_chunks
         self.openai_api_key = openai_api_key
         self.openai_model = openai_model
         self.fallback_model = fallback_model
+        self.local_llm = local_llm
+        self.context_max_chars = context_max_chars
+        self.confident_distance = confident_distance
+        self.fallback_onnx = fallback_onnx
+        self.fallback_onnx_path = fallback_onnx_path
         self._hf_pipeline = None
+        # Concurrent local-model prompts are grouped into one padded forward pass
+        self._hf_batcher = MicroBatcher(
+            self._generate_batch_hf, max_batch_size=hf_batch_size, max_wait_ms=hf_batch_wait_ms
+        )
+        # (normalized question, index version) -> (answer, sources)
+        self._answer_cache: TTLCache = TTLCache(maxsize=answer_cache_size, ttl=answer_cache_ttl)
+        self._answer_cache_lock = threading.Lock()
 
-    def _get_context(self, question: str) -> str:
-        """Retrieve relevant document chunks (semantic + keyword-style queries)."""
-        chunks = self.embeddings.search(question, top_k=self.top_k)
+    def _get_context(self, question: str) -> tuple[str, List[str]]:
+        """
+        Retrieve relevant document chunks (semantic + keyword-style queries).
+        Returns (context_text, primary top-k chunks for the question itself).
+        """
         # Also search for key phrases so policy-style questions (e.g. "annual leave")
         # retrieve the right section even if wording differs
-        words = [w.strip() for w in question.replace("?", "").lower().split() if len(w.strip()) > 2]
+        words = _WORD_RE.findall(question.lower())
         extra_queries = [" ".join(words[:3])] if words else []
-        for i in range(len(words) - 1):
-            extra_queries.append(" ".join(words[i : i + 2]))
-        for q in extra_queries[:3]:  # at most 3 extra queries
-            if not q:
-                continue
-            for c in self.embeddings.search(q, top_k=3):
-                if c not in chunks:
-                    chunks.append(c)
-        return "\n\n---\n\n".join(chunks) if chunks else ""
-
-    def _answer_with_openai(self, question: str, context: str) -> str:
-        """Use OpenAI API for answer generation."""
+        # Only the first two bigrams can make the cut below
+        extra_queries += [f"{a} {b}" for a, b in zip(words[:2], words[1:3])]
+        # At most 3 extra queries; skip empty / repeated ones so nothing is embedded twice
+        queries = [question]
+        for q in extra_queries[:3]:
+            if q and q not in queries:
+                queries.append(q)
+        # One embeddings round-trip for everything: a few extra tokens cost far less than
+        # a second request if the extra searches turn out to be needed
+        vectors = self.embeddings.embed_queries(queries)
+        results = self.embeddings.search_by_embeddings(vectors[:1], top_k=self.top_k)
+        primary_hits = results[0] if results else []
+        primary = [hit.text for hit in primary_hits]
+        # Skip the extra keyword searches when the best semantic hit is already a close match
+        confident = bool(primary_hits) and primary_hits[0].distance <= self.confident_distance
+        if len(vectors) > 1 and not confident:
+            results += self.embeddings.search_by_embeddings(vectors[1:], top_k=3)
+        # Dedup by Chroma chunk id (constant-time set lookup, no full-text compares)
+        seen = set()
+        chunks = []
+        for hits in results:
+            for hit in hits:
+                if hit.id not in seen:
+                    seen.add(hit.id)
+                    chunks.append(hit.text)
+        context = "\n\n---\n\n".join(chunks) if chunks else ""
+        return context, primary
+
+    async def _answer_with_openai(self, question: str, context: str) -> str:
+        """Use OpenAI API for answer generation (awaited, so the event loop stays free)."""
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=self.openai_api_key)
+            client = get_async_openai_client(self.openai_api_key)
             system = (
                 "You are a helpful assistant. Answer the user's question using the "
                 "following context from uploaded documents. Use the context to give a "
@@ -61,7 +119,7 @@ class ChatService:
                 "found in the context. Prefer answering from the context when relevant."
             )
             user = f"Context:\n{context}\n\nQuestion: {question}"
-            resp = client.chat.completions.create(
+            resp = await client.chat.completions.create(
                 model=self.openai_model,
                 messages=[
                     {"role": "system", "content": system},
@@ -73,42 +131,88 @@ class ChatService:
         except Exception as e:
             return f"[OpenAI error: {e}. Falling back to local model.]"
 
-    def _answer_with_hf(self, question: str, context: str) -> str:
-        """Use HuggingFace pipeline (e.g. FLAN-T5) for local answer generation."""
-        if self._hf_pipeline is None:
-            from transformers import pipeline
-            self._hf_pipeline = pipeline(
+    def _load_hf_pipeline(self):
+        """
+        Build the local text2text pipeline once. With fallback_onnx, run the model on
+        ONNX Runtime (optimum) from fallback_onnx_path (pre-exported, optionally INT8);
+        without a path the model is exported on first load. Raises ImportError if
+        fallback_onnx is set but optimum is not installed.
+        """
+        from transformers import pipeline
+        if self.fallback_onnx:
+            try:
+                from optimum.onnxruntime import ORTModelForSeq2SeqLM
+            except ImportError as e:
+                raise ImportError(
+                    "FALLBACK_ONNX=true requires optimum with ONNX Runtime: "
+                    "pip install 'optimum[onnxruntime]' (or unset FALLBACK_ONNX to run on PyTorch)."
+                ) from e
+            from transformers import AutoTokenizer
+
+            source = str(self.fallback_onnx_path) if self.fallback_onnx_path else self.fallback_model
+            model = ORTModelForSeq2SeqLM.from_pretrained(source, export=self.fallback_onnx_path is None)
+            return pipeline(
                 "text2text-generation",
-                model=self.fallback_model,
+                model=model,
+                tokenizer=AutoTokenizer.from_pretrained(source),
                 max_length=200,
             )
+        return pipeline(
+            "text2text-generation",
+            model=self.fallback_model,
+            max_length=200,
+        )
+
+    def _generate_batch_hf(self, prompts: List[str]) -> List[str]:
+        """Run the local pipeline once over a batch of prompts (called by the batcher)."""
+        # Only the batcher's worker thread gets here, so lazy loading needs no lock
+        if self._hf_pipeline is None:
+            self._hf_pipeline = self._load_hf_pipeline()
+        outs = self._hf_pipeline(prompts, max_length=150, do_sample=False, batch_size=len(prompts))
+        results = []
+        for out in outs:
+            out = out[0] if isinstance(out, list) else out
+            results.append((out.get("generated_text") or "").strip())
+        return results
+
+    def _answer_with_hf(self, question: str, context: str) -> str:
+        """Use HuggingFace pipeline (e.g. FLAN-T5) for local answer generation."""
         # Ask for a short answer so the model extracts from context (e.g. "18" for annual leave)
         prompt = (
             f"Based on the context below, answer the question with a short, direct answer. "
             f"If the context does not have the answer, say 'Not in context.'\n\n"
-            f"Context: {context[:2500]}\n\nQuestion: {question}\n\nAnswer:"
+            f"Context: {context[: self.context_max_chars]}\n\nQuestion: {question}\n\nAnswer:"
         )
-        out = self._hf_pipeline(prompt, max_length=150, do_sample=False)
-        return (out[0].get("generated_text") or "").strip()
+        return self._hf_batcher.submit(prompt)
 
-    def answer(self, question: str) -> tuple[str, List[str]]:
+    async def answer(self, question: str) -> tuple[str, List[str]]:
         """
         Answer the user question using RAG.
         Returns (answer_text, list of source chunk excerpts).
+        Repeated questions against an unchanged index are served from an LRU+TTL cache.
+        Blocking retrieval and local generation run in the threadpool; the OpenAI call is awaited.
         """
-        context = self._get_context(question)
+        key = (" ".join(question.lower().split()), self.embeddings.version())
+        with self._answer_cache_lock:
+            cached = self._answer_cache.get(key)
+        if cached is not None:
+            return cached
+
+        context, primary_chunks = await run_in_threadpool(self._get_context, question)
         if not context:
-            n = self.embeddings.count()
+            n = await run_in_threadpool(self.embeddings.count)
             if n == 0:
                 msg = "No documents have been uploaded yet, or the knowledge base is empty. Please upload a PDF first."
             else:
                 msg = f"No relevant context found for your question (index has {n} chunks). Try rephrasing or ask something that matches the document content."
             return (msg, [])
-        if self.openai_api_key:
-            answer = self._answer_with_openai(question, context)
+        if self.openai_api_key and not self.local_llm:
+            answer = await self._answer_with_openai(question, context)
         else:
-            answer = self._answer_with_hf(question, context)
-        # Use first 100 chars of each chunk as "source" for UI
-        chunks = self.embeddings.search(question, top_k=self.top_k)
-        sources = [c[:150] + ("..." if len(c) > 150 else "") for c in chunks]
+            answer = await run_in_threadpool(self._answer_with_hf, question, context)
+        # Use first 150 chars of each primary top-k chunk as "source" for UI
+        sources = [c[:150] + ("..." if len(c) > 150 else "") for c in primary_chunks]
+        if not answer.startswith("[OpenAI error:"):
+            with self._answer_cache_lock:
+                self._answer_cache[key] = (answer, sources)
         return answer, sources
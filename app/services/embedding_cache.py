@@ -0,0 +1,85 @@
+"""
+Persistent, content-addressed cache of embedding vectors.
+
+Main functionality:
+- text_key: blake2b digest of a text, used as the cache key (with the model name).
+- EmbeddingCache: sqlite table in the vector store directory mapping
+  (model, text_key) -> float32 vector, so re-uploaded chunks are not re-embedded
+  across restarts. Bounded by max_rows; least recently used rows are evicted first.
+"""
+
+import sqlite3
+import threading
+import time
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from app.services.sqlite_util import in_clause_batches
+
+
+def text_key(text: str) -> str:
+    """Stable 128-bit content key for a text."""
+    return blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """sqlite-backed (model, text_key) -> vector store with LRU eviction; safe to share across threads."""
+
+    def __init__(self, path: Path, max_rows: int = 50_000):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max(1, max_rows)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+                "used REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (model, key)) WITHOUT ROWID"
+            )
+            # Caches created before eviction existed have no last-used column
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")}
+            if "used" not in columns:
+                self._db.execute("ALTER TABLE embeddings ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+
+    def get_many(self, model: str, keys: List[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors for whichever keys are present (and mark them used)."""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for part, placeholders in in_clause_batches(unique):
+                for key, blob in self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [model, *part],
+                ):
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                with self._db:
+                    for part, placeholders in in_clause_batches(list(found)):
+                        self._db.execute(
+                            f"UPDATE embeddings SET used = ? WHERE model = ? AND key IN ({placeholders})",
+                            [now, model, *part],
+                        )
+        return found
+
+    def set_many(self, model: str, items: Iterable[Tuple[str, List[float]]]) -> None:
+        now = time.time()
+        rows = [(model, key, np.asarray(vec, dtype=np.float32).tobytes(), now) for key, vec in items]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, used) VALUES (?, ?, ?, ?)", rows
+            )
+            (n,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if n > self.max_rows:
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE (model, key) IN "
+                    "(SELECT model, key FROM embeddings ORDER BY used LIMIT ?)",
+                    (n - self.max_rows,),
+                )
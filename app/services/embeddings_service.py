@@ -2,29 +2,82 @@
 Embeddings and vector store for semantic search over document chunks.
 
 Main functionality:
-- add_chunks: embed text chunks using OpenAI embeddings and store in ChromaDB.
+- add_chunks: embed text chunks using OpenAI embeddings and upsert them (content-hash ids,
+  so re-uploads are idempotent) into the vector store
+  (ChromaDB by default, or FAISS HNSW; vectors are L2-normalized, inner-product space).
 - search: embed query using OpenAI, run similarity search, return top-k chunk texts.
+- search_many: same for several queries in one embeddings request and one store query.
+- embed_queries / search_by_embeddings: the two halves of search_many, so callers can
+  embed once and decide which store queries to run. Query embeddings are LRU-cached
+  in process; chunk embeddings are also cached on disk by (model, content hash), with
+  LRU eviction past embedding_cache_max_rows.
 - count / clear: for status and reset.
+- version: counter bumped by add_chunks / clear, used to invalidate answer caches.
 
 Uses a single shared instance (get_embeddings_service)
-so upload and chat use the same OpenAI-based collection (1536-dim).
+so upload and chat use the same OpenAI-based collection (1536-dim, or fewer when
+embedding_dimensions is set to shrink the index).
 """
 
 
 
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
-
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from openai import OpenAI
-
-
-OPENAI_EMBED_BATCH_SIZE = 100
+from typing import List, Literal, Optional
+
+import numpy as np
+
+from app.services.batching import MicroBatcher
+from app.services.embedding_cache import EmbeddingCache, text_key
+from app.services.openai_client import get_openai_client
+from app.services.vector_store import ChromaStore, FaissHNSWStore, SearchHit, VectorStore
+
+
+# Vector size of text-embedding-3-small when embedding_dimensions is not set
+OPENAI_EMBED_DEFAULT_DIM = 1536
+# Per embeddings request: max inputs (API allows 2048) and max total characters. Chunks
+# have no hard size cap (a dense page can be one chunk), so the character budget keeps a
+# request under the API's 300k-token limit (~4 chars/token, with headroom for denser text)
+OPENAI_EMBED_BATCH_SIZE = 512
+OPENAI_EMBED_BATCH_CHARS = 400_000
+# Max embeddings requests in flight at once (stays under typical rate limits)
+OPENAI_EMBED_CONCURRENCY = 8
+QUERY_EMBED_CACHE_SIZE = 1024
+# Cross-request query batching: max concurrent requests per embeddings call, wait window
+QUERY_BATCH_MAX_REQUESTS = 32
+QUERY_BATCH_WAIT_MS = 5
+
+
+def _budget_batches(order: List[int], texts: List[str]) -> List[List[int]]:
+    """Split text indices (in order) into batches capped by input count and total characters."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    chars = 0
+    for i in order:
+        n = len(texts[i])
+        if current and (len(current) >= OPENAI_EMBED_BATCH_SIZE or chars + n > OPENAI_EMBED_BATCH_CHARS):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(i)
+        chars += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _normalize(vectors: List[List[float]]) -> List[List[float]]:
+    """L2-normalize rows so inner product equals cosine similarity."""
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (arr / norms).tolist()
 
 
 class EmbeddingsService:
-    """Manage document embeddings using OpenAI + ChromaDB."""
+    """Manage document embeddings using OpenAI + a vector store (ChromaDB or FAISS)."""
 
     def __init__(
         self,
@@ -32,118 +85,228 @@ class EmbeddingsService:
         collection_name: str = "pdf_chunks_openai",
         openai_api_key: Optional[str] = None,
         openai_embedding_model: str = "text-embedding-3-small",
+        embedding_dimensions: Optional[int] = None,
+        vector_store: Literal["chroma", "faiss"] = "chroma",
+        embedding_cache: bool = True,
+        embedding_cache_max_rows: int = 50_000,
+        faiss_fp16: bool = True,
     ):
         if not openai_api_key:
             raise ValueError("OpenAI API key is required.")
+        if vector_store not in ("chroma", "faiss"):
+            raise ValueError(f"Unknown vector store {vector_store!r} (expected 'chroma' or 'faiss').")
 
         self.openai_api_key = openai_api_key
         self.openai_embedding_model = openai_embedding_model
-        self._client: chromadb.PersistentClient | None = None
-        self._collection = None
+        self.embedding_dimensions = embedding_dimensions
         self.persist_directory = Path(persist_directory) if persist_directory else None
-        self.collection_name = collection_name
-
-        # Initialize OpenAI client once
-        self.openai_client = OpenAI(api_key=self.openai_api_key)
-
-    def _embed(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings from OpenAI."""
-        all_embeddings = []
-
-        for i in range(0, len(texts), OPENAI_EMBED_BATCH_SIZE):
-            batch = texts[i : i + OPENAI_EMBED_BATCH_SIZE]
-
-            resp = self.openai_client.embeddings.create(
-                model=self.openai_embedding_model,
-                input=batch,
+        # Vectors of different sizes cannot share a collection
+        self.collection_name = (
+            f"{collection_name}_{embedding_dimensions}" if embedding_dimensions else collection_name
+        )
+        self.store: VectorStore = (
+            FaissHNSWStore(self.persist_directory, self.collection_name, fp16=faiss_fp16)
+            if vector_store == "faiss"
+            else ChromaStore(
+                self.persist_directory,
+                self.collection_name,
+                dim=embedding_dimensions or OPENAI_EMBED_DEFAULT_DIM,
             )
+        )
 
-            batch_embeddings = [
-                e.embedding for e in sorted(resp.data, key=lambda x: x.index)
-            ]
-            all_embeddings.extend(batch_embeddings)
-
-        return all_embeddings
-
-    def _get_client(self) -> chromadb.PersistentClient:
-        if self._client is None:
-            path = str(self.persist_directory) if self.persist_directory else None
-
-            if path:
-                self.persist_directory.mkdir(parents=True, exist_ok=True)
+        # Shared process-wide client: pooled HTTP/2 connections, also used by chat
+        self.openai_client = get_openai_client(self.openai_api_key)
 
-            self._client = chromadb.PersistentClient(
-                path=path or "./chroma_db",
-                settings=ChromaSettings(anonymized_telemetry=False),
+        # Persistent (model, content hash) -> vector cache of chunk embeddings next to the
+        # vector store; kept across clear() so re-uploads after a reset skip OpenAI
+        self._embed_cache = (
+            EmbeddingCache(
+                (self.persist_directory or Path("./chroma_db")) / "embed_cache.sqlite3",
+                max_rows=embedding_cache_max_rows,
             )
+            if embedding_cache
+            else None
+        )
+        self._embed_cache_model = f"{openai_embedding_model}:{embedding_dimensions or 'full'}"
+
+        # LRU of query text -> embedding; query vectors do not depend on the index
+        self._query_cache: OrderedDict[str, List[float]] = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        # Query-embedding misses from concurrent chat requests share one embeddings call
+        self._query_batcher = MicroBatcher(
+            self._embed_query_groups,
+            max_batch_size=QUERY_BATCH_MAX_REQUESTS,
+            max_wait_ms=QUERY_BATCH_WAIT_MS,
+        )
 
-        return self._client
+        # Bumped whenever the index changes, so callers can key caches on index contents
+        self._version = 0
 
-    @property
-    def collection(self):
-        if self._collection is None:
-            client = self._get_client()
-            self._collection = client.get_or_create_collection(
-                name=self.collection_name,
-                metadata={"description": "PDF document chunks for RAG"},
-            )
-        return self._collection
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """One embeddings request; vectors placed by the response's index field."""
+        extra = {"dimensions": self.embedding_dimensions} if self.embedding_dimensions else {}
+        resp = self.openai_client.embeddings.create(
+            model=self.openai_embedding_model,
+            input=batch,
+            **extra,
+        )
+        out: List[List[float]] = [[] for _ in batch]
+        for e in resp.data:
+            out[e.index] = e.embedding
+        return out
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Get L2-normalized embeddings, from the persistent cache where possible; only
+        texts not seen before (for this model) are sent to OpenAI.
+        """
+        if not texts or self._embed_cache is None:
+            return self._embed_openai(texts)
+
+        keys = [text_key(t) for t in texts]
+        cached = self._embed_cache.get_many(self._embed_cache_model, keys)
+        # One index per distinct missing text, so duplicates are embedded once
+        first_index = {}
+        for i, k in enumerate(keys):
+            if k not in cached:
+                first_index.setdefault(k, i)
+        misses = list(first_index.values())
+        if misses:
+            fresh = self._embed_openai([texts[i] for i in misses])
+            new_items = {keys[i]: vec for i, vec in zip(misses, fresh)}
+            self._embed_cache.set_many(self._embed_cache_model, new_items.items())
+            cached.update(new_items)
+        return [cached[k] for k in keys]
+
+    def _embed_openai(self, texts: List[str]) -> List[List[float]]:
+        """
+        Get embeddings from OpenAI, L2-normalized for the inner-product index.
+        Large inputs are split into batches sent concurrently (bounded in-flight requests);
+        texts are grouped by length so each batch's latency tracks similar-sized items, and
+        batches of long texts hold fewer inputs (character budget) to stay under the token cap.
+        """
+        if not texts:
+            return []
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = _budget_batches(order, texts)
+        batch_texts = [[texts[i] for i in b] for b in batches]
+
+        if len(batches) == 1:
+            results = [self._embed_batch(batch_texts[0])]
+        else:
+            workers = min(OPENAI_EMBED_CONCURRENCY, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self._embed_batch, batch_texts))
+
+        all_embeddings: List[List[float]] = [[] for _ in texts]
+        for b, vectors in zip(batches, results):
+            for i, vec in zip(b, vectors):
+                all_embeddings[i] = vec
+
+        return _normalize(all_embeddings)
 
     def add_chunks(self, chunks: List[str], metadata: dict | None = None) -> int:
         if not chunks:
             return 0
 
+        # Content-hash ids: re-uploading the same text upserts instead of duplicating it
+        by_id = {f"c_{text_key(c)}": c for c in chunks}
+        ids = list(by_id)
+        chunks = list(by_id.values())
         embeddings = self._embed(chunks)
 
-        ids = [f"chunk_{i}_{abs(hash(c)) % 10**8}" for i, c in enumerate(chunks)]
-        meta = metadata or {}
-        metadatas = [dict(meta) for _ in chunks]
+        # Same metadata for every chunk: one copy, referenced per row (stores only serialize it)
+        meta = dict(metadata or {})
+        metadatas = [meta] * len(chunks)
 
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadatas,
-        )
+        self.store.upsert(ids, embeddings, chunks, metadatas)
+        self._version += 1
 
         return len(chunks)
 
     def search(self, query: str, top_k: int = 5) -> List[str]:
-        query_embedding = self._embed([query])
-
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=min(top_k, self.collection.count() or 1),
-            include=["documents"],
-        )
-
-        docs = results.get("documents", [[]])
-        return list(docs[0]) if docs else []
+        return [hit.text for hit in self.search_many([query], top_k=top_k)[0]]
+
+    def _embed_query_groups(self, groups: List[List[str]]) -> List[List[List[float]]]:
+        """
+        Batcher callback: embed every request's queries in one call, split back per request.
+        Queries bypass the disk cache (one-off questions would crowd out chunk vectors);
+        repeats are served by the in-process LRU.
+        """
+        flat = self._embed_openai([q for group in groups for q in group])
+        out, pos = [], 0
+        for group in groups:
+            out.append(flat[pos : pos + len(group)])
+            pos += len(group)
+        return out
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed several query texts (for use with search_by_embeddings). Repeated queries
+        are served from an in-process LRU; the misses are dynamically batched with those
+        of concurrent requests into one embeddings call.
+        """
+        vectors: List[Optional[List[float]]] = [None] * len(queries)
+        misses: List[int] = []
+        with self._query_cache_lock:
+            for i, q in enumerate(queries):
+                vec = self._query_cache.get(q)
+                if vec is None:
+                    misses.append(i)
+                else:
+                    self._query_cache.move_to_end(q)
+                    vectors[i] = vec
+
+        if misses:
+            fresh = self._query_batcher.submit([queries[i] for i in misses])
+            with self._query_cache_lock:
+                for i, vec in zip(misses, fresh):
+                    vectors[i] = vec
+                    self._query_cache[queries[i]] = vec
+                while len(self._query_cache) > QUERY_EMBED_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+
+        return vectors
+
+    def search_many(self, queries: List[str], top_k: int = 5) -> List[List[SearchHit]]:
+        """
+        Search several queries at once: one embeddings request for all of them and a
+        single store query. Returns one top-k list of hits per query, in order.
+        """
+        return self.search_by_embeddings(self.embed_queries(queries), top_k=top_k)
+
+    def search_by_embeddings(
+        self, query_embeddings: List[List[float]], top_k: int = 5
+    ) -> List[List[SearchHit]]:
+        """Run one vector-store query for precomputed query embeddings; one hit list per embedding."""
+        return self.store.query(query_embeddings, top_k)
 
     def count(self) -> int:
-        return self.collection.count()
+        return self.store.count()
 
     def clear(self) -> None:
-        client = self._get_client()
-        client.delete_collection(name=self.collection_name)
-        self._collection = None
+        self.store.clear()
+        self._version += 1
 
-
-# Shared instance
-_embeddings_service: Optional[EmbeddingsService] = None
+    def version(self) -> int:
+        """Index version; changes on every add_chunks / clear."""
+        return self._version
 
 
+# Shared instance
+@lru_cache(maxsize=1)
 def get_embeddings_service() -> EmbeddingsService:
-    global _embeddings_service
-
-    if _embeddings_service is None:
-        from app.config import get_settings
-        s = get_settings()
-
-        _embeddings_service = EmbeddingsService(
-            persist_directory=s.vector_store_path,
-            openai_api_key=s.openai_api_key,
-            openai_embedding_model=s.openai_embedding_model,
-        )
-
-    return _embeddings_service
\ No newline at end of file
+    from app.config import get_settings
+    s = get_settings()
+
+    return EmbeddingsService(
+        persist_directory=s.vector_store_path,
+        openai_api_key=s.openai_api_key,
+        openai_embedding_model=s.openai_embedding_model,
+        embedding_dimensions=s.openai_embedding_dimensions,
+        vector_store=s.vector_store,
+        embedding_cache=s.embedding_cache,
+        embedding_cache_max_rows=s.embedding_cache_max_rows,
+        faiss_fp16=s.faiss_fp16,
+    )
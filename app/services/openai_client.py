@@ -0,0 +1,38 @@
+"""
+Shared OpenAI clients.
+
+Main functionality:
+- get_openai_client: one OpenAI client per API key, backed by a pooled HTTP/2 httpx
+  client so chat and embedding calls reuse established TLS connections.
+- get_async_openai_client: same for AsyncOpenAI (async httpx client), used by the chat path.
+"""
+
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+OPENAI_TIMEOUT_SECONDS = 60.0
+OPENAI_MAX_KEEPALIVE = 20
+
+
+@lru_cache(maxsize=4)
+def get_openai_client(api_key: str) -> OpenAI:
+    """Return the process-wide OpenAI client for this key (built once, connections kept alive)."""
+    http_client = httpx.Client(
+        http2=True,
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_keepalive_connections=OPENAI_MAX_KEEPALIVE),
+    )
+    return OpenAI(api_key=api_key, http_client=http_client)
+
+
+@lru_cache(maxsize=4)
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """Async counterpart of get_openai_client, for awaiting calls on the event loop."""
+    http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_keepalive_connections=OPENAI_MAX_KEEPALIVE),
+    )
+    return AsyncOpenAI(api_key=api_key, http_client=http_client)
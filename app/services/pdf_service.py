@@ -2,18 +2,42 @@
 PDF text extraction and chunking for the chatbot knowledge base.
 
 Main functionality:
-- extract_text: open PDF with PyMuPDF (fitz), get text per page, return full text and page count.
+- iter_pages: open PDF with PyMuPDF (fitz) and yield text per page (small page ranges
+  extracted in parallel by a worker pool reused across uploads for large PDFs, a bounded
+  number in flight).
+- extract_text: full text and page count (joined pages; kept for callers that want one string).
 - chunk_text: split by paragraph (double newline) then merge into chunks of ~chunk_size with overlap
   so policy/list content stays together for better RAG retrieval.
-- process_pdf: orchestrate extract + chunk; used by the upload API.
+- process_pdf: stream pages into the chunker (no full-document string); used by the upload API.
 """
 
+import multiprocessing
+import os
 import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List
 
 import fitz  # PyMuPDF
 
+from app.pdf_extract import extract_range
+
+# Whitespace / paragraph / sentence patterns, compiled once for the chunking hot loop
+_WS = re.compile(r"[ \t]+")
+_BLANKS = re.compile(r"\n{3,}")
+_PARA = re.compile(r"\n\s*\n")
+_SENT = re.compile(r"(?<=[.!?])\s+")
+
+# Serial get_text() measured ~1.5-2.5 ms per dense page; a warm worker task (reopen +
+# hand-off of 8 pages) costs ~5 ms. Below ~64 pages (~150 ms serial) the saving on a
+# few cores is too small to be worth the pool, which also costs ~0.6 s to start once
+PARALLEL_EXTRACT_MIN_PAGES = 64
+# Pages per worker task; with one task in flight per worker, at most about
+# workers * this many extracted pages are held in memory at once
+PARALLEL_EXTRACT_RANGE_PAGES = 8
+
 
 class PDFService:
     """Extract and chunk text from PDF documents for embedding and retrieval."""
@@ -21,18 +45,58 @@ class PDFService:
     def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.extract_workers = os.cpu_count() or 1
+        # Worker pool for large PDFs, started on first use and reused across uploads
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn, not fork: the server process already runs threads (batchers,
+                    # threadpool) and holds sqlite/httpx connections, and forking it can
+                    # deadlock the children. Workers only import app.pdf_extract (PyMuPDF)
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.extract_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._pool
+
+    def iter_pages(self, file_path: Path) -> Iterator[str]:
+        """
+        Yield the raw text of each page in order; the document is closed when done.
+        Large PDFs are extracted in parallel in small contiguous page ranges, with one
+        range in flight per worker, so memory stays bounded by the workers' ranges rather
+        than the whole document.
+        """
+        with fitz.open(file_path) as doc:
+            n_pages = doc.page_count
+            if n_pages < PARALLEL_EXTRACT_MIN_PAGES or self.extract_workers < 2:
+                for page in doc:
+                    yield page.get_text()
+                return
+
+        bounds = deque(
+            (lo, min(lo + PARALLEL_EXTRACT_RANGE_PAGES, n_pages))
+            for lo in range(0, n_pages, PARALLEL_EXTRACT_RANGE_PAGES)
+        )
+        pool = self._get_pool()
+        pending = deque()
+        while bounds or pending:
+            while bounds and len(pending) < self.extract_workers:
+                lo, hi = bounds.popleft()
+                pending.append(pool.submit(extract_range, str(file_path), lo, hi))
+            # Results are consumed in page order; the next range is submitted as each
+            # one is taken, so later finished ranges never pile up
+            yield from pending.popleft().result()
 
     def extract_text(self, file_path: Path) -> tuple[str, int]:
         """
         Extract raw text from a PDF file using PyMuPDF.
         Returns (full_text, number_of_pages).
         """
-        doc = fitz.open(file_path)
-        pages = []
-        for page in doc:
-            text = page.get_text()
-            pages.append(text)
-        doc.close()
+        pages = list(self.iter_pages(file_path))
         full_text = "\n\n".join(pages)
         return full_text.strip(), len(pages)
 
@@ -40,50 +104,63 @@ class PDFService:
         """Normalize multiple spaces to one; preserve paragraph breaks (double newline)."""
         if not text:
             return ""
-        text = re.sub(r"[ \t]+", " ", text)
-        text = re.sub(r"\n{3,}", "\n\n", text)
+        text = _WS.sub(" ", text)
+        text = _BLANKS.sub("\n\n", text)
         return text.strip()
 
+    def _split_paragraphs(self, text: str) -> List[str]:
+        """Normalize whitespace and split into paragraphs (double newline)."""
+        text = self._normalize_whitespace(text)
+        if not text:
+            return []
+        return [p.strip() for p in _PARA.split(text) if p.strip()]
+
+    def _with_sentence_fallback(self, paras: Iterable[str]) -> Iterator[str]:
+        """
+        Pass paragraphs through; if the whole input turns out to be a single paragraph
+        (no paragraph breaks at all), split it into sentences instead.
+        """
+        it = iter(paras)
+        first = next(it, None)
+        if first is None:
+            return
+        second = next(it, None)
+        if second is None:
+            sentences = _SENT.split(first)
+            yield from (s for s in sentences if s.strip())
+            return
+        yield first
+        yield second
+        yield from it
+
     def chunk_text(self, text: str) -> List[str]:
         """
         Split text into overlapping chunks. Uses paragraph boundaries first so
         policy/list content (e.g. "Leave Entitlement", "18 Annual Leaves") stays
         together in focused chunks for better retrieval.
         """
-        text = self._normalize_whitespace(text)
-        if not text:
-            return []
-
-        # Split into paragraphs (double newline) so sections stay together
-        raw_paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-        if not raw_paras:
-            return []
-
-        # If no paragraph breaks, fall back to sentence split
-        if len(raw_paras) == 1:
-            sentences = re.split(r"(?<=[.!?])\s+", raw_paras[0])
-            raw_paras = [s for s in sentences if s.strip()]
+        return self._chunk_paragraphs(self._with_sentence_fallback(self._split_paragraphs(text)))
 
+    def _chunk_paragraphs(self, raw_paras: Iterable[str]) -> List[str]:
+        """Merge paragraphs into chunks of ~chunk_size, carrying up to chunk_overlap chars over."""
         chunks = []
-        current = []
-        current_len = 0
+        current: deque = deque()
+        current_len = 0  # running total of len(p) + 2 over current, kept incrementally
 
         for para in raw_paras:
             para_len = len(para) + 2  # +2 for "\n\n"
             if current_len + para_len > self.chunk_size and current:
-                chunk = "\n\n".join(current)
-                chunks.append(chunk)
-                # Overlap: keep last paragraphs that fit in overlap
+                chunks.append("\n\n".join(current))
+                # Overlap: keep the last paragraphs that fit in chunk_overlap, popped off the
+                # end of the finished chunk (each paragraph is moved at most once)
+                overlap: deque = deque()
                 overlap_len = 0
-                overlap_paras = []
-                for p in reversed(current):
-                    if overlap_len + len(p) + 2 <= self.chunk_overlap:
-                        overlap_paras.insert(0, p)
-                        overlap_len += len(p) + 2
-                    else:
-                        break
-                current = overlap_paras
-                current_len = sum(len(p) + 2 for p in current)
+                while current and overlap_len + len(current[-1]) + 2 <= self.chunk_overlap:
+                    p = current.pop()
+                    overlap.appendleft(p)
+                    overlap_len += len(p) + 2
+                current = overlap
+                current_len = overlap_len
             current.append(para)
             current_len += para_len
 
@@ -94,8 +171,17 @@ class PDFService:
     def process_pdf(self, file_path: Path) -> tuple[List[str], int]:
         """
         Extract text from PDF and return chunked paragraphs and page count.
+        Pages are streamed into the chunker as they are extracted (no full-document string;
+        large PDFs hold at most the in-flight page ranges of iter_pages).
         Returns (chunks, page_count).
         """
-        full_text, page_count = self.extract_text(file_path)
-        chunks = self.chunk_text(full_text)
+        page_count = 0
+
+        def paragraphs() -> Iterator[str]:
+            nonlocal page_count
+            for page_text in self.iter_pages(file_path):
+                page_count += 1
+                yield from self._split_paragraphs(page_text)
+
+        chunks = self._chunk_paragraphs(self._with_sentence_fallback(paragraphs()))
         return chunks, page_count
@@ -0,0 +1,21 @@
+"""
+Small sqlite helpers shared by the embedding cache and the FAISS store.
+
+Main functionality:
+- in_clause_batches: split values for a `col IN (...)` lookup into groups that stay under
+  sqlite's bound-parameter limit (999 before 3.32), with their placeholder strings.
+"""
+
+from typing import Iterator, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Values per statement; leaves room for a few other parameters under the 999 limit
+SQLITE_MAX_PARAMS = 500
+
+
+def in_clause_batches(values: Sequence[T]) -> Iterator[Tuple[List[T], str]]:
+    """Yield (values part, "?,?,...") pairs of at most SQLITE_MAX_PARAMS values each."""
+    for i in range(0, len(values), SQLITE_MAX_PARAMS):
+        part = list(values[i : i + SQLITE_MAX_PARAMS])
+        yield part, ",".join("?" * len(part))
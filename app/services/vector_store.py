@@ -0,0 +1,319 @@
+"""
+Vector stores behind EmbeddingsService: upsert / query / count / clear over unit-length vectors.
+
+Main functionality:
+- ChromaStore: ChromaDB persistent collection (inner-product HNSW, graph/ef settings
+  tuned by vector size); default backend.
+- FaissHNSWStore: in-RAM FAISS HNSW index (vectors stored as fp16 by default, half the
+  memory of float32) for lower per-query overhead, with chunk text/metadata in a sqlite
+  table next to it; persisted with faiss.write_index on change.
+- SearchHit: one retrieved chunk (id, text, distance) as returned by query.
+
+Distances follow Chroma's "ip" space in both stores: 1 - inner product (= 1 - cosine).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+from app.services.sqlite_util import in_clause_batches
+
+CHROMA_CONSTRUCTION_EF = 128
+CHROMA_SEARCH_EF = 100
+FAISS_HNSW_M = 32
+FAISS_EF_CONSTRUCTION = 200
+FAISS_EF_SEARCH = 128
+
+
+class SearchHit(NamedTuple):
+    """One retrieved chunk: its id, document text and distance to the query."""
+
+    id: str
+    text: str
+    distance: float
+
+
+def _chroma_hnsw_params(dim: Optional[int]) -> dict:
+    """
+    HNSW settings for a new Chroma collection. Chroma's defaults (M=16, search_ef=10)
+    trade recall for speed; high-dimensional vectors (e.g. 1536-dim OpenAI) need a denser graph.
+    """
+    return {
+        "hnsw:M": 32 if (dim or 0) >= 1024 else 16,
+        "hnsw:construction_ef": CHROMA_CONSTRUCTION_EF,
+        "hnsw:search_ef": CHROMA_SEARCH_EF,
+        "hnsw:num_threads": os.cpu_count() or 1,
+    }
+
+
+class VectorStore(ABC):
+    """Interface shared by the vector store backends."""
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[dict],
+    ) -> None:
+        """
+        Store chunks by id. Ids are content hashes, so an id already present keeps its
+        text and vector (one entry, never duplicated) and takes the new metadata: the
+        most recent upload of a shared chunk wins, in every backend.
+        """
+
+    @abstractmethod
+    def query(self, query_embeddings: List[List[float]], top_k: int) -> List[List[SearchHit]]:
+        """Return one top-k hit list per query embedding, in order."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every stored chunk."""
+
+
+class ChromaStore(VectorStore):
+    """ChromaDB persistent collection in inner-product space."""
+
+    def __init__(self, persist_directory: Optional[Path], collection_name: str, dim: Optional[int] = None):
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.dim = dim
+        self._client: chromadb.PersistentClient | None = None
+        self._collection = None
+        # Cached collection size so queries skip a count() round-trip; None = unknown
+        self._count: int | None = None
+
+    def _get_client(self) -> chromadb.PersistentClient:
+        if self._client is None:
+            path = str(self.persist_directory) if self.persist_directory else None
+
+            if path:
+                self.persist_directory.mkdir(parents=True, exist_ok=True)
+
+            self._client = chromadb.PersistentClient(
+                path=path or "./chroma_db",
+                settings=ChromaSettings(anonymized_telemetry=False),
+            )
+
+        return self._client
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            client = self._get_client()
+            self._collection = client.get_or_create_collection(
+                name=self.collection_name,
+                # Vectors are unit-length, so inner product == cosine without per-query norms.
+                # HNSW settings only apply when the collection is first created.
+                metadata={
+                    "description": "PDF document chunks for RAG",
+                    "hnsw:space": "ip",
+                    **_chroma_hnsw_params(self.dim),
+                },
+            )
+        return self._collection
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        # One write per Chroma max batch (the client rejects larger adds); normally one call
+        collection = self.collection
+        client = self._get_client()
+        step = client.get_max_batch_size() if hasattr(client, "get_max_batch_size") else len(ids)
+        for i in range(0, len(ids), max(1, step)):
+            collection.upsert(
+                ids=ids[i : i + step],
+                embeddings=embeddings[i : i + step],
+                documents=documents[i : i + step],
+                metadatas=metadatas[i : i + step],
+            )
+        # Re-read lazily once: upserts of already-stored ids do not grow the collection
+        self._count = None
+
+    def query(self, query_embeddings, top_k):
+        if not query_embeddings:
+            return []
+        n = self.count()
+        if n == 0:
+            return [[] for _ in query_embeddings]
+
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=min(top_k, n),
+            include=["documents", "distances"],
+        )
+
+        # Chroma returns one list per query embedding for ids and each included field
+        return [
+            list(map(SearchHit, q_ids, q_docs, q_dists))
+            for q_ids, q_docs, q_dists in zip(results["ids"], results["documents"], results["distances"])
+        ]
+
+    def count(self) -> int:
+        if self._count is None:
+            self._count = self.collection.count()
+        return self._count
+
+    def clear(self) -> None:
+        client = self._get_client()
+        client.delete_collection(name=self.collection_name)
+        self._collection = None
+        self._count = 0
+
+
+class FaissHNSWStore(VectorStore):
+    """
+    FAISS HNSW index (inner product) held in RAM; row i of the index maps to row i of
+    a sqlite table holding chunk id, text and metadata. Requires faiss (faiss-cpu).
+    With fp16, vectors are stored as half floats (IndexHNSWSQ), otherwise as float32
+    (IndexHNSWFlat); an index already on disk keeps the format it was built with.
+    """
+
+    def __init__(self, persist_directory: Optional[Path], name: str, fp16: bool = True):
+        import faiss  # optional dependency, only needed for this backend
+
+        self._faiss = faiss
+        self.fp16 = fp16
+        directory = Path(persist_directory or "./faiss_db")
+        directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = directory / f"{name}.faiss"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(directory / f"{name}.sqlite3", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT NOT NULL, metadata TEXT)"
+        )
+        self._index = self._load_index()
+        # The index file is replaced before chunk rows are committed; rows past its end are
+        # left over from an interrupted write and would block those rows (and ids) forever
+        with self._db:
+            self._db.execute(
+                "DELETE FROM chunks WHERE row >= ?",
+                (self._index.ntotal if self._index is not None else 0,),
+            )
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return None
+        index = self._faiss.read_index(str(self.index_path))
+        index.hnsw.efSearch = FAISS_EF_SEARCH
+        return index
+
+    def _write_index(self) -> None:
+        """Persist the index atomically: write a temp file, then rename it over the old one."""
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        self._faiss.write_index(self._index, str(tmp_path))
+        os.replace(tmp_path, self.index_path)
+
+    def _new_index(self, dim: int):
+        faiss = self._faiss
+        if self.fp16:
+            # Unit-length components are well inside fp16 range; recall loss is negligible
+            index = faiss.IndexHNSWSQ(
+                dim, faiss.ScalarQuantizer.QT_fp16, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            index = faiss.IndexHNSWFlat(dim, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = FAISS_EF_CONSTRUCTION
+        index.hnsw.efSearch = FAISS_EF_SEARCH
+        return index
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        if not ids:
+            return
+        with self._lock:
+            # HNSW has no delete/update; ids are content hashes, so a stored id already
+            # has the same text and vector: only its metadata is replaced (as Chroma upsert does)
+            existing = set()
+            for part, placeholders in in_clause_batches(ids):
+                existing.update(
+                    row[0]
+                    for row in self._db.execute(f"SELECT id FROM chunks WHERE id IN ({placeholders})", part)
+                )
+            keep = []
+            replaced = {}
+            for i, chunk_id in enumerate(ids):
+                if chunk_id in existing:
+                    replaced[chunk_id] = json.dumps(metadatas[i])
+                else:
+                    existing.add(chunk_id)
+                    keep.append(i)
+            if replaced:
+                with self._db:
+                    self._db.executemany(
+                        "UPDATE chunks SET metadata = ? WHERE id = ?",
+                        [(meta, chunk_id) for chunk_id, meta in replaced.items()],
+                    )
+            if not keep:
+                return
+            vectors = np.asarray([embeddings[i] for i in keep], dtype=np.float32)
+            if self._index is None:
+                self._index = self._new_index(vectors.shape[1])
+            if not self._index.is_trained:
+                # fp16 scalar quantizer has no learned parameters; train() just marks it ready
+                self._index.train(vectors)
+            start = self._index.ntotal
+            self._index.add(vectors)
+            # Index first, rows second: a failure in between leaves unreferenced vectors
+            # (harmless), never rows pointing past the end of the index
+            try:
+                self._write_index()
+            except Exception:
+                self._index = self._load_index()  # drop the unsaved additions
+                raise
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (start + n, ids[i], documents[i], json.dumps(metadatas[i]))
+                        for n, i in enumerate(keep)
+                    ],
+                )
+
+    def query(self, query_embeddings, top_k):
+        if not query_embeddings:
+            return []
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return [[] for _ in query_embeddings]
+            k = min(top_k, self._index.ntotal)
+            scores, rows = self._index.search(np.asarray(query_embeddings, dtype=np.float32), k)
+            wanted = sorted({int(r) for r in rows.ravel() if r >= 0})
+            if not wanted:
+                return [[] for _ in query_embeddings]
+            by_row = {}
+            for part, placeholders in in_clause_batches(wanted):
+                for row, chunk_id, doc in self._db.execute(
+                    f"SELECT row, id, document FROM chunks WHERE row IN ({placeholders})", part
+                ):
+                    by_row[row] = (chunk_id, doc)
+        return [
+            [
+                SearchHit(by_row[int(r)][0], by_row[int(r)][1], 1.0 - float(s))
+                for s, r in zip(q_scores, q_rows)
+                if r >= 0 and int(r) in by_row
+            ]
+            for q_scores, q_rows in zip(scores, rows)
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._index.ntotal if self._index is not None else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+            self.index_path.unlink(missing_ok=True)
+            with self._db:
+                self._db.execute("DELETE FROM chunks")
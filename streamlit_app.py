@@ -9,11 +9,14 @@ Main functionality:
 """
 
 import os
-import io
 import streamlit as st
 import httpx
 
 API_URL = os.environ.get("API_URL", "http://localhost:8000").rstrip("/")
+# Per-call read timeouts (s); connecting to the local backend should be near-instant
+UPLOAD_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+CLEAR_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+ASK_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
 
 st.set_page_config(page_title="PDF Chatbot", page_icon="📄", layout="centered")
 st.title("PDF Chatbot")
@@ -24,24 +27,29 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 
 
+@st.cache_resource
+def get_client() -> httpx.Client:
+    """One pooled HTTP client shared across reruns and sessions (keep-alive to the API)."""
+    return httpx.Client(timeout=ASK_TIMEOUT)
+
+
 def upload_pdf(file):
-    """POST file to /documents/upload. Returns (success, message). Uses BytesIO for httpx multipart."""
+    """POST file to /documents/upload. Returns (success, message). Streams the uploaded file object."""
     if file is None:
         return False, "No file selected."
     try:
-        raw = file.getvalue()
-        if not raw or len(raw) == 0:
+        if not file.size:
             return False, "File is empty or could not be read. Try selecting the file again."
         filename = file.name or "document.pdf"
         if not filename.lower().endswith(".pdf"):
             filename = filename + ".pdf"
-        # httpx expects a file-like object for multipart, not raw bytes
-        file_like = io.BytesIO(raw)
-        with httpx.Client(timeout=120.0) as client:
-            resp = client.post(
-                f"{API_URL}/documents/upload",
-                files={"file": (filename, file_like, "application/pdf")},
-            )
+        # UploadedFile is file-like: httpx reads it into the multipart body, no extra copy
+        file.seek(0)
+        resp = get_client().post(
+            f"{API_URL}/documents/upload",
+            files={"file": (filename, file, "application/pdf")},
+            timeout=UPLOAD_TIMEOUT,
+        )
         data = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {}
         if resp.status_code != 200:
             detail = data.get("detail", "Upload failed.")
@@ -58,8 +66,7 @@ def upload_pdf(file):
 def clear_index():
     """POST to /documents/clear. Returns (success, message)."""
     try:
-        with httpx.Client(timeout=10.0) as client:
-            resp = client.post(f"{API_URL}/documents/clear")
+        resp = get_client().post(f"{API_URL}/documents/clear", timeout=CLEAR_TIMEOUT)
         data = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {}
         if resp.status_code != 200:
             return False, data.get("detail", "Failed to clear index.")
@@ -73,11 +80,11 @@ def clear_index():
 def ask_chat(question: str):
     """POST to /chat/ask with {question}. Returns (answer, sources) or (error_message, None) on error."""
     try:
-        with httpx.Client(timeout=60.0) as client:
-            resp = client.post(
-                f"{API_URL}/chat/ask",
-                json={"question": question},
-            )
+        resp = get_client().post(
+            f"{API_URL}/chat/ask",
+            json={"question": question},
+            timeout=ASK_TIMEOUT,
+        )
         data = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {}
         if resp.status_code != 200:
             return data.get("detail", "Something went wrong."), None